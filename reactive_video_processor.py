@@ -9,212 +9,564 @@ Reactive Programming Paradigm Example: High-Concurrency Video Data Processing
 """
 
 import asyncio
+import hashlib
+import os
+import re
+import struct
 import time
-from typing import AsyncGenerator, Callable, Any, List
+import types
+from collections import deque
+from typing import AsyncGenerator, Awaitable, Callable, Any, Iterator, List, Mapping, Optional, Union
 from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor
 import logging
 
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba 是可选依赖，缺失时退回 NumPy 实现
+    njit = None
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# 工作队列中的结束标记
+_SENTINEL = object()
+
+# 相邻帧的时间间隔（纳秒），对应模拟的10ms读取延迟
+FRAME_INTERVAL_NS = 10_000_000
+
+# 模拟视频源每次到达的帧数：定时器按 10 帧的时间间隔触发一次，而不是每帧唤醒一次
+FEED_TICK_FRAMES = 10
+
+# CPU线程池的线程数上限
+MAX_CPU_WORKERS = 16
+
+# 每帧数据的固定字节数（按行存放在 FrameBatch.data 中）
+FRAME_SIZE = 32
+
+# 不超过该字节数的帧直接在事件循环中执行滤镜内核，省去线程池调度开销
+INLINE_KERNEL_MAX_BYTES = 64 * 1024
+
+# 保存阶段：每攒够这么多帧或等待超过该时间（秒）就批量写出一次
+SAVE_BATCH_SIZE = 32
+SAVE_FLUSH_INTERVAL = 0.02
+
+# 输出文件开头的头部：本次运行开始时的墙上时钟（Unix 纳秒）
+FILE_HEADER = struct.Struct("<q")
+
+# 输出文件中每帧记录的头部：帧号、相对运行开始的时间戳（纳秒）、数据长度
+FRAME_RECORD_HEADER = struct.Struct("<qqI")
+
+# 同时处理的视频源数量上限
+MAX_CONCURRENT_SOURCES = 16
+
+# 滤镜查找表（示例：反色）
+_FILTER_LUT = (255 - np.arange(256)).astype(np.uint8)
+
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def _filter_kernel(src, dst, lut):
+        """逐字节查表的滤镜内核（JIT编译，执行期间释放GIL）"""
+        for i in range(src.size):
+            dst[i] = lut[src[i]]
+else:
+    def _filter_kernel(src, dst, lut):
+        """逐字节查表的滤镜内核（NumPy实现）"""
+        np.take(lut, src, out=dst)
+
+@dataclass(slots=True, frozen=True)
 class VideoFrame:
     """视频帧数据结构"""
     frame_id: int
-    data: bytes
-    timestamp: float
-    metadata: dict
+    data: memoryview
+    timestamp: int  # 单调时钟，纳秒
+    metadata: Mapping[str, str]  # 同一视频源的所有帧共享同一个只读映射
 
 @dataclass
+class FrameBatch:
+    """
+    一批视频帧（结构体数组布局）
+    每个字段是一整列连续数组，过滤和变换直接作用于整批数据
+    """
+    frame_ids: np.ndarray   # int64[n]
+    timestamps: np.ndarray  # int64[n]，单调时钟纳秒
+    data: np.ndarray        # uint8[n, FRAME_SIZE]
+    metadata: Mapping[str, str]
+    buffer: Optional[bytearray] = None  # data 所在的池化缓冲区
+    pending_frames: int = 0  # 已入队但尚未处理完的帧数，归零时归还 buffer
+    
+    def __len__(self) -> int:
+        return len(self.frame_ids)
+    
+    def __getitem__(self, mask: np.ndarray) -> "FrameBatch":
+        """按布尔掩码选取帧，返回新的批次"""
+        return FrameBatch(
+            frame_ids=self.frame_ids[mask],
+            timestamps=self.timestamps[mask],
+            data=self.data[mask],
+            metadata=self.metadata
+        )
+    
+    def frames(self) -> Iterator[VideoFrame]:
+        """逐帧展开，供按帧处理的工作协程使用"""
+        for i in range(len(self)):
+            yield VideoFrame(
+                frame_id=int(self.frame_ids[i]),
+                data=memoryview(self.data[i]),
+                timestamp=int(self.timestamps[i]),
+                metadata=self.metadata
+            )
+
+def even_frames(batch: FrameBatch) -> np.ndarray:
+    """偶数帧掩码：对整列帧号做一次位运算"""
+    return (batch.frame_ids & 1) == 0
+
+@dataclass(slots=True, frozen=True)
 class ProcessedFrame:
     """处理后的视频帧"""
     frame_id: int
-    processed_data: bytes
+    processed_data: memoryview
     processing_time: float
-    original_timestamp: float
+    original_timestamp: int
+
+class BufferPool:
+    """
+    可复用字节缓冲池
+    缓冲区按2的幂分桶，避免每帧都向分配器申请新的 bytes 对象
+    """
+    
+    def __init__(self, max_buffers_per_bucket: int = 64):
+        self.max_buffers_per_bucket = max_buffers_per_bucket
+        # 桶大小 -> 空闲缓冲区；deque 的 append/pop 在线程池中调用也是安全的
+        self._buckets = {}
+    
+    @staticmethod
+    def _bucket_size(min_size: int) -> int:
+        return 1 << max(min_size - 1, 0).bit_length()
+    
+    def acquire(self, min_size: int) -> bytearray:
+        """取出一个长度不小于 min_size 的缓冲区"""
+        size = self._bucket_size(min_size)
+        bucket = self._buckets.get(size)
+        if bucket:
+            try:
+                return bucket.pop()
+            except IndexError:
+                pass
+        return bytearray(size)
+    
+    def release(self, view: Union[memoryview, bytearray]):
+        """归还 acquire 得到的缓冲区（传入缓冲区本身或其上的 memoryview）"""
+        buf = view.obj if isinstance(view, memoryview) else view
+        if not isinstance(buf, bytearray):
+            return
+        bucket = self._buckets.setdefault(len(buf), deque())
+        if len(bucket) < self.max_buffers_per_bucket:
+            bucket.append(buf)
+    
+    def acquire_array(self, rows: int, cols: int) -> tuple:
+        """取出缓冲区并视为 uint8[rows, cols] 数组，返回 (数组, 缓冲区)"""
+        size = rows * cols
+        buf = self.acquire(size)
+        array = np.frombuffer(buf, dtype=np.uint8, count=size).reshape(rows, cols)
+        return array, buf
 
 class ReactiveVideoStream:
-    """响应式视频流处理器"""
+    """
+    响应式视频流处理器
+    
+    max_concurrent_tasks 只控制同时在途的 asyncio 处理任务数（工作协程数），
+    不等于操作系统线程数：CPU线程池最多 min(max_concurrent_tasks, CPU核数, 16)
+    个线程，I/O 阶段使用独立的 io_executor（线程数默认等于 max_concurrent_tasks）。
     
-    def __init__(self, max_concurrent_tasks: int = 10):
+    processing_delay 模拟滤镜之外的耗时处理（编码等）；为 0 时小帧的滤镜内核
+    直接在事件循环中执行，不再经过线程池。
+    """
+    
+    def __init__(
+        self, 
+        max_concurrent_tasks: int = 10, 
+        io_workers: Optional[int] = None,
+        processing_delay: float = 0.05
+    ):
         self.max_concurrent_tasks = max_concurrent_tasks
-        self.semaphore = asyncio.Semaphore(max_concurrent_tasks)
-        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_tasks)
+        self.processing_delay = processing_delay
+        cpu_workers = min(max_concurrent_tasks, os.cpu_count() or 4, MAX_CPU_WORKERS)
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers)
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers or max_concurrent_tasks)
+        self.buffer_pool = BufferPool()
         
-    async def create_video_stream(self, video_source: str) -> AsyncGenerator[VideoFrame, None]:
+    async def create_video_stream(
+        self, 
+        video_source: str,
+        batch_size: int = 32
+    ) -> AsyncGenerator[FrameBatch, None]:
         """
         创建响应式视频流
-        模拟从视频源读取帧数据
+        模拟从视频源读取帧数据，每凑满 batch_size 帧产出一个 FrameBatch
         """
         logger.info(f"开始创建视频流: {video_source}")
         
-        # 模拟视频帧生成
-        for frame_id in range(100):  # 模拟100帧
-            # 模拟从视频源读取数据的延迟
-            await asyncio.sleep(0.01)  # 10ms延迟模拟I/O操作
-            
-            frame = VideoFrame(
-                frame_id=frame_id,
-                data=f"frame_data_{frame_id}".encode(),
-                timestamp=time.time(),
-                metadata={"source": video_source, "format": "h264"}
-            )
-            
-            yield frame
+        total_frames = 100  # 模拟100帧
+        metadata = types.MappingProxyType({"source": video_source, "format": "h264"})
+        # 帧时间戳由流开始时刻和帧号推算，保证单调递增且不必每帧读时钟
+        base_ts = time.monotonic_ns()
+        
+        # 模拟从视频源读取数据的延迟（每帧10ms）：预先排好定时器，
+        # 每次触发时把"已到达的帧数"放入队列，消费者按自己的节奏读取
+        loop = asyncio.get_running_loop()
+        arrivals: asyncio.Queue = asyncio.Queue()
+        handles = []
+        for tick_start in range(0, total_frames, FEED_TICK_FRAMES):
+            arrived = min(tick_start + FEED_TICK_FRAMES, total_frames)
+            delay = arrived * FRAME_INTERVAL_NS / 1e9
+            handles.append(loop.call_later(delay, arrivals.put_nowait, arrived))
+        
+        try:
+            arrived = 0
+            for start in range(0, total_frames, batch_size):
+                count = min(batch_size, total_frames - start)
+                while arrived < start + count:
+                    arrived = await arrivals.get()
+                
+                data, buffer = self.buffer_pool.acquire_array(count, FRAME_SIZE)
+                data.fill(0)
+                frame_ids = np.arange(start, start + count, dtype=np.int64)
+                for i in range(count):
+                    payload = f"frame_data_{start + i}".encode()
+                    data[i, :len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+                
+                yield FrameBatch(
+                    frame_ids=frame_ids,
+                    timestamps=base_ts + frame_ids * FRAME_INTERVAL_NS,
+                    data=data,
+                    metadata=metadata,
+                    buffer=buffer
+                )
+        finally:
+            for handle in handles:
+                handle.cancel()
     
     async def process_frame_async(self, frame: VideoFrame) -> ProcessedFrame:
         """
         异步处理单个视频帧
-        使用信号量控制并发数量，避免资源耗尽
+        并发数量由 batch_process 中的工作协程数量控制
         """
-        async with self.semaphore:
-            start_time = time.time()
-            
-            # 模拟CPU密集型处理（在线程池中执行）
+        start_time = time.perf_counter()
+        
+        if not self.processing_delay and frame.data.nbytes <= INLINE_KERNEL_MAX_BYTES:
+            # 短内核的执行时间小于线程池调度开销，直接同步执行
+            processed_data = self._cpu_intensive_processing(frame.data)
+        else:
+            # CPU密集型处理（在线程池中执行）
             loop = asyncio.get_event_loop()
             processed_data = await loop.run_in_executor(
                 self.executor, 
                 self._cpu_intensive_processing, 
                 frame.data
             )
-            
-            processing_time = time.time() - start_time
-            
-            return ProcessedFrame(
-                frame_id=frame.frame_id,
-                processed_data=processed_data,
-                processing_time=processing_time,
-                original_timestamp=frame.timestamp
-            )
+        
+        processing_time = time.perf_counter() - start_time
+        
+        return ProcessedFrame(
+            frame_id=frame.frame_id,
+            processed_data=processed_data,
+            processing_time=processing_time,
+            original_timestamp=frame.timestamp
+        )
     
-    def _cpu_intensive_processing(self, data: bytes) -> bytes:
+    def _cpu_intensive_processing(self, data: memoryview) -> memoryview:
         """
-        模拟CPU密集型处理（图像滤镜、编码等）
+        CPU密集型处理：滤镜内核 + 模拟的编码耗时
         """
-        # 模拟处理时间
-        time.sleep(0.05)  # 50ms处理时间
-        return f"processed_{data.decode()}".encode()
+        if self.processing_delay:
+            # 模拟处理时间
+            time.sleep(self.processing_delay)  # 默认50ms处理时间
+        
+        src = np.frombuffer(data, dtype=np.uint8)
+        out = self.buffer_pool.acquire(src.size)
+        _filter_kernel(src, np.frombuffer(out, dtype=np.uint8, count=src.size), _FILTER_LUT)
+        return memoryview(out)[:src.size]
     
     async def apply_transformations(
         self, 
-        stream: AsyncGenerator[VideoFrame, None],
-        transformations: List[Callable[[VideoFrame], VideoFrame]]
-    ) -> AsyncGenerator[VideoFrame, None]:
+        stream: AsyncGenerator[FrameBatch, None],
+        transformations: List[Callable[[FrameBatch], FrameBatch]]
+    ) -> AsyncGenerator[FrameBatch, None]:
         """
         对视频流应用变换操作（响应式操作符）
+        每个变换接收整批帧，直接对数组做运算
         """
-        async for frame in stream:
+        async for batch in stream:
             # 应用所有变换
-            transformed_frame = frame
+            transformed_batch = batch
             for transform in transformations:
-                transformed_frame = transform(transformed_frame)
-            yield transformed_frame
+                transformed_batch = transform(transformed_batch)
+            yield transformed_batch
     
     async def filter_frames(
         self, 
-        stream: AsyncGenerator[VideoFrame, None],
-        predicate: Callable[[VideoFrame], bool]
-    ) -> AsyncGenerator[VideoFrame, None]:
+        stream: AsyncGenerator[FrameBatch, None],
+        predicate: Callable[[FrameBatch], np.ndarray]
+    ) -> AsyncGenerator[FrameBatch, None]:
         """
         过滤视频流（响应式过滤操作符）
+        predicate 对整批帧返回布尔掩码
         """
-        async for frame in stream:
-            if predicate(frame):
-                yield frame
+        async for batch in stream:
+            selected = self._select(batch, predicate)
+            if len(selected):
+                yield selected
+    
+    def _select(
+        self, 
+        batch: FrameBatch, 
+        predicate: Callable[[FrameBatch], np.ndarray]
+    ) -> FrameBatch:
+        """按 predicate 的掩码选取帧"""
+        selected = batch[predicate(batch)]
+        # 选取结果是新数组，原批次的缓冲区直接归还
+        if batch.buffer is not None:
+            self.buffer_pool.release(batch.buffer)
+        return selected
     
     async def batch_process(
         self, 
-        stream: AsyncGenerator[VideoFrame, None],
+        stream: AsyncGenerator[FrameBatch, None],
         batch_size: int = 5
     ) -> AsyncGenerator[List[ProcessedFrame], None]:
         """
         批量处理视频帧（响应式批处理操作符）
         """
-        batch = []
-        async for frame in stream:
-            batch.append(frame)
-            
-            if len(batch) >= batch_size:
-                # 并发处理整个批次
-                tasks = [self.process_frame_async(frame) for frame in batch]
-                processed_batch = await asyncio.gather(*tasks)
-                yield processed_batch
-                batch = []
+        async def feed(queue: asyncio.Queue):
+            async for frame_batch in stream:
+                await self._enqueue_batch(queue, frame_batch)
         
-        # 处理剩余的帧
-        if batch:
-            tasks = [self.process_frame_async(frame) for frame in batch]
-            processed_batch = await asyncio.gather(*tasks)
+        async for processed_batch in self._process_with_workers(feed, batch_size):
             yield processed_batch
+    
+    async def fused_pipeline(
+        self,
+        video_source: str,
+        predicate: Callable[[FrameBatch], np.ndarray],
+        batch_size: int = 5
+    ) -> AsyncGenerator[List[ProcessedFrame], None]:
+        """
+        读取、过滤、批处理融合在一起的处理流程
+        
+        等价于 batch_process(filter_frames(create_video_stream(...)))，
+        但过滤和入队直接在读取循环中完成，帧不再逐个穿过多层异步生成器。
+        """
+        async def feed(queue: asyncio.Queue):
+            async for frame_batch in self.create_video_stream(video_source):
+                await self._enqueue_batch(queue, self._select(frame_batch, predicate))
+        
+        async for processed_batch in self._process_with_workers(feed, batch_size):
+            yield processed_batch
+    
+    async def _enqueue_batch(self, queue: asyncio.Queue, batch: FrameBatch):
+        """把批次逐帧放入工作队列；帧引用批次的数据，批次全部处理完才归还缓冲区"""
+        batch.pending_frames = len(batch)
+        if not batch.pending_frames and batch.buffer is not None:
+            self.buffer_pool.release(batch.buffer)
+        for frame in batch.frames():
+            await queue.put((frame, batch))
+    
+    def _frame_done(self, batch: FrameBatch):
+        """批次中的一帧处理结束（成功或失败）"""
+        batch.pending_frames -= 1
+        if not batch.pending_frames and batch.buffer is not None:
+            self.buffer_pool.release(batch.buffer)
+            batch.buffer = None
+    
+    async def _process_with_workers(
+        self,
+        feed: Callable[[asyncio.Queue], Awaitable[None]],
+        batch_size: int
+    ) -> AsyncGenerator[List[ProcessedFrame], None]:
+        """
+        工作协程池
+        
+        feed 通过 _enqueue_batch 把帧放入有界输入队列，max_concurrent_tasks 个常驻工作协程
+        逐帧取出处理并放入输出队列；这里按完成顺序每凑满 batch_size 帧
+        产出一批。慢帧只占用一个工作协程，不会阻塞整批。
+        """
+        num_workers = self.max_concurrent_tasks
+        input_queue: asyncio.Queue = asyncio.Queue(maxsize=num_workers * 2)
+        output_queue: asyncio.Queue = asyncio.Queue(maxsize=num_workers * 2)
+        
+        async def producer():
+            await feed(input_queue)
+            # 每个工作协程一个结束标记
+            for _ in range(num_workers):
+                await input_queue.put(_SENTINEL)
+        
+        async def worker():
+            while True:
+                item = await input_queue.get()
+                if item is _SENTINEL:
+                    await output_queue.put(_SENTINEL)
+                    return
+                frame, batch = item
+                try:
+                    processed = await self.process_frame_async(frame)
+                except Exception as e:
+                    # 把异常交给消费者重新抛出
+                    processed = e
+                finally:
+                    self._frame_done(batch)
+                await output_queue.put(processed)
+        
+        async def run_producer():
+            try:
+                await producer()
+            except Exception as e:
+                await output_queue.put(e)
+        
+        producer_task = asyncio.create_task(run_producer())
+        worker_tasks = [asyncio.create_task(worker()) for _ in range(num_workers)]
+        
+        try:
+            # 先进先出缓冲：尾部追加、头部取出，整个流中复用同一个 deque
+            pending = deque()
+            finished_workers = 0
+            while finished_workers < num_workers:
+                item = await output_queue.get()
+                if item is _SENTINEL:
+                    finished_workers += 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                
+                pending.append(item)
+                if len(pending) >= batch_size:
+                    yield [pending.popleft() for _ in range(batch_size)]
+            
+            # 处理剩余的帧
+            if pending:
+                yield list(pending)
+                pending.clear()
+        finally:
+            for task in (producer_task, *worker_tasks):
+                task.cancel()
+            await asyncio.gather(producer_task, *worker_tasks, return_exceptions=True)
 
 class VideoProcessingPipeline:
-    """响应式视频处理管道"""
+    """
+    响应式视频处理管道
+    
+    指定 output_dir 时处理结果写入 output_dir/<文件名>-<哈希>.bin
+    （文件名取自视频源路径/URL的最后一段，哈希区分同名视频源），
+    否则只模拟保存的I/O耗时。
+    
+    每次运行都会覆盖同一视频源的旧文件。文件以 FILE_HEADER（本次运行
+    开始时的 Unix 纳秒时间）开头，之后每帧一条记录：FRAME_RECORD_HEADER
+    （帧号、相对运行开始的纳秒偏移、数据长度）后接处理后的数据。
+    同一次运行中视频源不能重复。
+    """
     
-    def __init__(self):
+    def __init__(self, output_dir: Optional[str] = None):
         self.stream_processor = ReactiveVideoStream(max_concurrent_tasks=20)
         self.error_count = 0
         self.processed_count = 0
+        self.output_dir = output_dir
+        # 待保存的 (视频源, 处理后的帧)，由后台任务批量写出
+        self.outbox: Optional[asyncio.Queue] = None
+        # 视频源 -> 已打开的输出文件，同一视频源的多次写入复用文件描述符
+        self._writers = {}
+        # 处理或保存失败的视频源
+        self._failed_sources = set()
+        # 本次运行开始时刻：单调时钟（帧时间戳的基准）和对应的墙上时钟
+        self._run_base_ns = 0
+        self._run_wall_ns = 0
     
     async def create_processing_pipeline(self, video_sources: List[str]):
         """
         创建完整的响应式处理管道
         """
+        if len(set(video_sources)) != len(video_sources):
+            raise ValueError("视频源不能重复")
+        
         logger.info("启动响应式视频处理管道")
-        start_time = time.time()
+        start_time = time.perf_counter()
+        self._run_base_ns = time.monotonic_ns()
+        self._run_wall_ns = time.time_ns()
         
-        # 为每个视频源创建处理任务
-        tasks = []
-        for source in video_sources:
-            task = asyncio.create_task(self._process_single_source(source))
-            tasks.append(task)
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+        self.outbox = asyncio.Queue()
+        self._failed_sources = set()
+        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SOURCES)
+        
+        async def run_source(source: str):
+            async with semaphore:
+                try:
+                    await self._process_single_source(source)
+                except Exception:
+                    # 错误隔离：单个视频源失败不取消其他视频源（错误已在内部记录）
+                    self._failed_sources.add(source)
         
-        # 并发处理所有视频源
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # 结构化并发：保存任务和所有视频源任务属于同一个任务组，
+        # 任何一方意外退出时其余任务都会被取消（单个视频源的保存失败在
+        # _write_frames 中按视频源处理，不会导致整个任务组退出）
+        try:
+            async with asyncio.TaskGroup() as pipeline_group:
+                pipeline_group.create_task(self._flush_outbox())
+                
+                # 并发处理所有视频源
+                async with asyncio.TaskGroup() as source_group:
+                    for source in video_sources:
+                        source_group.create_task(run_source(source))
+                
+                # 写出发件箱中剩余的帧
+                await self.outbox.put(_SENTINEL)
+        finally:
+            self._close_writers()
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         
-        # 统计结果
-        successful_results = [r for r in results if not isinstance(r, Exception)]
-        failed_results = [r for r in results if isinstance(r, Exception)]
+        # 统计结果（处理或保存失败都算失败）
+        successful = sum(1 for source in video_sources if source not in self._failed_sources)
+        failed = len(video_sources) - successful
         
         logger.info(f"处理完成！")
         logger.info(f"总耗时: {total_time:.2f}秒")
-        logger.info(f"成功处理: {len(successful_results)}个视频源")
-        logger.info(f"失败: {len(failed_results)}个视频源")
+        logger.info(f"成功处理: {successful}个视频源")
+        logger.info(f"失败: {failed}个视频源")
         logger.info(f"总处理帧数: {self.processed_count}")
         
         return {
             "total_time": total_time,
-            "successful": len(successful_results),
-            "failed": len(failed_results),
+            "successful": successful,
+            "failed": failed,
             "total_frames": self.processed_count
         }
     
     async def _process_single_source(self, video_source: str):
         """处理单个视频源"""
         try:
-            # 创建视频流
-            video_stream = self.stream_processor.create_video_stream(video_source)
-            
-            # 应用变换：只处理偶数帧（模拟帧率降低）
-            filtered_stream = self.stream_processor.filter_frames(
-                video_stream,
-                lambda frame: frame.frame_id % 2 == 0
+            # 读取视频流 -> 只处理偶数帧（模拟帧率降低）-> 批量处理
+            batch_stream = self.stream_processor.fused_pipeline(
+                video_source,
+                even_frames,
+                batch_size=5
             )
             
-            # 批量处理
-            batch_stream = self.stream_processor.batch_process(filtered_stream, batch_size=5)
-            
-            # 处理每个批次
-            async for processed_batch in batch_stream:
-                self.processed_count += len(processed_batch)
-                
-                # 模拟保存处理结果
-                await self._save_processed_frames(processed_batch, video_source)
-                
-                logger.info(f"[{video_source}] 处理了 {len(processed_batch)} 帧")
+            # 处理每个批次（工作协程池已在后台预读后续批次）
+            try:
+                async for processed_batch in batch_stream:
+                    self.processed_count += len(processed_batch)
+                    
+                    # 保存处理结果（放入发件箱，不等待写出）
+                    await self._save_processed_frames(processed_batch, video_source)
+                    
+                    logger.info(f"[{video_source}] 处理了 {len(processed_batch)} 帧")
+            finally:
+                await batch_stream.aclose()
         
         except Exception as e:
             self.error_count += 1
@@ -222,13 +574,135 @@ class VideoProcessingPipeline:
             raise
     
     async def _save_processed_frames(self, frames: List[ProcessedFrame], source: str):
-        """模拟保存处理后的帧"""
-        # 模拟异步I/O操作
-        await asyncio.sleep(0.01)
+        """把处理后的帧放入发件箱，由 _flush_outbox 跨视频源批量保存"""
+        for frame in frames:
+            self.outbox.put_nowait((source, frame))
+    
+    async def _flush_outbox(self):
+        """
+        后台保存任务
+        攒够 SAVE_BATCH_SIZE 帧或距第一帧到达超过 SAVE_FLUSH_INTERVAL 秒时写出一次
+        """
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            item = await self.outbox.get()
+            if item is _SENTINEL:
+                break
+            
+            pending = [item]
+            deadline = loop.time() + SAVE_FLUSH_INTERVAL
+            while len(pending) < SAVE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.outbox.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _SENTINEL:
+                    done = True
+                    break
+                pending.append(item)
+            
+            await self._write_frames(pending)
+    
+    async def _write_frames(self, items: List[tuple]):
+        """一次性保存一组处理后的帧，每个视频源只写一次"""
+        errors = []
+        try:
+            if self.output_dir is None:
+                # 模拟异步I/O操作
+                await asyncio.sleep(0.01)
+            else:
+                chunks = {}
+                for source, frame in items:
+                    chunks.setdefault(source, []).append(frame)
+                # 文件写入放到I/O线程池，不占用CPU线程池
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(
+                    self.stream_processor.io_executor,
+                    self._write_chunks,
+                    chunks
+                )
+                try:
+                    errors = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # I/O线程可能仍在写入，等它结束后才能归还缓冲区、关闭文件
+                    await asyncio.wait([future])
+                    raise
+        finally:
+            for _, frame in items:
+                self.stream_processor.buffer_pool.release(frame.processed_data)
         
-        # 这里可以实现实际的保存逻辑
-        # 例如：保存到数据库、文件系统或发送到其他服务
-        pass
+        # 错误隔离：保存失败只影响对应的视频源
+        for source, error in errors:
+            self.error_count += 1
+            self._failed_sources.add(source)
+            logger.error(f"保存视频源 {source} 的处理结果时出错: {error}")
+    
+    def _write_chunks(self, chunks: dict) -> List[tuple]:
+        """
+        把每个视频源的帧记录写入对应文件（在I/O线程池中执行）
+        返回写入失败的 (视频源, 异常) 列表；已失败的视频源不再写入
+        """
+        errors = []
+        for source, frames in chunks.items():
+            if source in self._failed_sources:
+                continue
+            try:
+                writer = self._writers.get(source)
+                if writer is None:
+                    # 本次运行第一次写该视频源：覆盖旧文件并写入文件头
+                    writer = open(self._output_path(source), "wb")
+                    self._writers[source] = writer
+                    writer.write(FILE_HEADER.pack(self._run_wall_ns))
+                # 工作协程按完成顺序产出帧，写出前按帧号排序
+                frames.sort(key=lambda frame: frame.frame_id)
+                for frame in frames:
+                    writer.write(FRAME_RECORD_HEADER.pack(
+                        frame.frame_id,
+                        frame.original_timestamp - self._run_base_ns,
+                        frame.processed_data.nbytes
+                    ))
+                    writer.write(frame.processed_data)
+                # 立即刷出，让写入错误在这里归到对应的视频源
+                writer.flush()
+            except (OSError, ValueError) as e:
+                errors.append((source, e))
+                # 该视频源不再写入；缓冲中未写出的数据已无法保存，关闭时忽略同一错误
+                writer = self._writers.pop(source, None)
+                if writer is not None:
+                    try:
+                        writer.close()
+                    except OSError:
+                        pass
+        return errors
+    
+    def _output_path(self, source: str) -> str:
+        """视频源对应的输出文件路径，保证位于 output_dir 之内"""
+        name = os.path.basename(source.rstrip("/\\"))
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", name).strip(".") or "source"
+        digest = hashlib.sha1(source.encode()).hexdigest()[:8]
+        
+        root = os.path.realpath(self.output_dir)
+        path = os.path.realpath(os.path.join(root, f"{name}-{digest}.bin"))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"输出路径超出输出目录: {path}")
+        return path
+    
+    def _close_writers(self):
+        """关闭所有输出文件；关闭失败只影响对应的视频源"""
+        try:
+            for source, writer in self._writers.items():
+                try:
+                    writer.close()
+                except OSError as e:
+                    self.error_count += 1
+                    self._failed_sources.add(source)
+                    logger.error(f"关闭视频源 {source} 的输出文件时出错: {e}")
+        finally:
+            self._writers.clear()
 
 # 传统同步处理方式（对比用）
 class TraditionalVideoProcessor:
@@ -237,7 +711,7 @@ class TraditionalVideoProcessor:
     def process_videos_sync(self, video_sources: List[str]):
         """同步处理多个视频源"""
         logger.info("启动传统同步视频处理")
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         total_frames = 0
         for source in video_sources:
@@ -247,19 +721,21 @@ class TraditionalVideoProcessor:
                 self._process_frame_sync(frame)
                 total_frames += 1
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         logger.info(f"同步处理完成！耗时: {total_time:.2f}秒，处理帧数: {total_frames}")
         return {"total_time": total_time, "total_frames": total_frames}
     
     def _generate_frames(self, source: str, count: int) -> List[VideoFrame]:
         """生成视频帧"""
         frames = []
+        metadata = types.MappingProxyType({"source": source})
+        base_ts = time.monotonic_ns()
         for i in range(count):
             frame = VideoFrame(
                 frame_id=i,
-                data=f"frame_data_{i}".encode(),
-                timestamp=time.time(),
-                metadata={"source": source}
+                data=memoryview(f"frame_data_{i}".encode()),
+                timestamp=base_ts + i * FRAME_INTERVAL_NS,
+                metadata=metadata
             )
             frames.append(frame)
         return frames
@@ -312,7 +788,7 @@ async def main():
     print("=" * 60)
     print("1. 并发处理：同时处理多个视频流")
     print("2. 异步I/O：不阻塞主线程")
-    print("3. 背压控制：通过信号量控制并发数量")
+    print("3. 背压控制：通过有界队列和线程池控制并发数量")
     print("4. 流式处理：数据流动式处理，内存效率高")
     print("5. 错误隔离：单个流的错误不影响其他流")
     print("6. 可组合性：操作符可以灵活组合")